@@ -1,32 +1,66 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Cookie, Depends, Request, Response
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
+from contextlib import asynccontextmanager
+from datetime import datetime
 import logging
+import orjson
+import os
+import uuid
 from services import AIShoppingService
-from models import SearchRequest, SearchResponse, ChatMessage
+from models import (
+    SearchRequest, SearchResponse, BatchSearchRequest, BatchSearchResponse,
+    ChatMessage, BatchChatRequest
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="AI Shopping Agent", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Initialize AI Shopping Service at startup rather than at import
+    ai_service = AIShoppingService()
+    await ai_service.warm_up()
+    
+    app.state.ai_service = ai_service
+    yield
+    await ai_service.close()
+
+def get_ai_service(request: Request) -> AIShoppingService:
+    return request.app.state.ai_service
+
+app = FastAPI(
+    title="AI Shopping Agent",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
+)
+
+# Compress larger payloads (product lists, static assets)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=4)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Initialize AI Shopping Service
-ai_service = AIShoppingService()
+# Cookie used to keep chat sessions apart when no X-Session-ID header is sent
+SESSION_COOKIE = "session_id"
+
+# Read the main page once at startup instead of on every request.
+# Only the bytes are shared: GZipMiddleware rewrites a response's headers in place.
+with open("static/index.html", "rb") as file:
+    INDEX_HTML = file.read()
 
 @app.get("/", response_class=HTMLResponse)
 async def read_root():
     """Serve the main application page"""
-    with open("static/index.html", "r") as file:
-        return HTMLResponse(content=file.read())
+    return HTMLResponse(content=INDEX_HTML)
 
 @app.post("/api/search", response_model=SearchResponse)
-async def search_products(request: SearchRequest):
+async def search_products(request: SearchRequest, ai_service: AIShoppingService = Depends(get_ai_service)):
     """
     Search for products based on natural language query
     """
@@ -36,49 +70,175 @@ async def search_products(request: SearchRequest):
         # Process the search query through AI services
         result = await ai_service.process_search_query(request.query)
         
-        return SearchResponse(
-            query=request.query,
-            products=result.get("products", []),
-            explanation=result.get("explanation", ""),
-            search_id=result.get("search_id", "")
-        )
+        return _json_response(_build_search_response(request.query, result))
     
     except Exception as e:
         logger.error(f"Search error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
+@app.post("/api/search/batch", response_model=BatchSearchResponse)
+async def search_products_batch(request: BatchSearchRequest, ai_service: AIShoppingService = Depends(get_ai_service)):
+    """
+    Search for products for several natural language queries in one request
+    """
+    try:
+        logger.info(f"Received batch search request: {len(request.queries)} queries")
+        
+        results = await ai_service.process_search_batch(request.queries)
+        
+        return _json_response(BatchSearchResponse(
+            results=[_build_search_response(query, result) for query, result in zip(request.queries, results)]
+        ))
+    
+    except Exception as e:
+        logger.error(f"Batch search error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Batch search failed: {str(e)}")
+
 @app.post("/api/chat")
-async def chat_with_agent(message: ChatMessage):
+async def chat_with_agent(
+    message: ChatMessage,
+    response: Response,
+    x_session_id: Optional[str] = Header(default=None),
+    session_id: Optional[str] = Cookie(default=None),
+    ai_service: AIShoppingService = Depends(get_ai_service)
+):
     """
     Handle conversational queries with the AI agent
     """
     try:
         logger.info(f"Received chat message: {message.content}")
         
-        # Generate session ID (in real app, this would come from user session)
-        session_id = "user_session"
+        session_id = _resolve_session_id(x_session_id, session_id, response)
         
         # Process chat message through AI services
-        response = await ai_service.process_chat_message(message.content, session_id)
+        result = await ai_service.process_chat_message(message.content, session_id)
         
-        return {
-            "response": response.get("message", "I'm sorry, I couldn't process your request."),
-            "has_products": response.get("has_products", False),
-            "products": response.get("products", []),
-            "filter_options": response.get("filter_options", []),
-            "filter_name": response.get("filter_name", ""),
-            "timestamp": response.get("timestamp")
-        }
+        return ORJSONResponse(content=_build_chat_response(result), headers=response.headers)
     
     except Exception as e:
         logger.error(f"Chat error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Chat processing failed: {str(e)}")
 
+@app.post("/api/chat/stream")
+async def chat_with_agent_stream(
+    message: ChatMessage,
+    response: Response,
+    x_session_id: Optional[str] = Header(default=None),
+    session_id: Optional[str] = Cookie(default=None),
+    ai_service: AIShoppingService = Depends(get_ai_service)
+):
+    """
+    Handle conversational queries with the AI agent as Server-Sent Events.
+    The reply text is sent as soon as it is known; products follow in the final "done" event.
+    """
+    logger.info(f"Received streaming chat message: {message.content}")
+    
+    session_id = _resolve_session_id(x_session_id, session_id, response)
+    
+    async def event_stream():
+        async for event, result in ai_service.stream_chat_message(message.content, session_id):
+            yield b"event: " + event.encode() + b"\ndata: " + orjson.dumps(_build_chat_response(result)) + b"\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=response.headers)
+
+@app.post("/api/chat/batch")
+async def chat_with_agent_batch(
+    request: BatchChatRequest,
+    response: Response,
+    x_session_id: Optional[str] = Header(default=None),
+    session_id: Optional[str] = Cookie(default=None),
+    ai_service: AIShoppingService = Depends(get_ai_service)
+):
+    """
+    Handle several conversational turns with the AI agent in one request
+    """
+    try:
+        logger.info(f"Received batch chat request: {len(request.messages)} messages")
+        
+        session_id = _resolve_session_id(x_session_id, session_id, response)
+        
+        results = await ai_service.process_chat_batch(request.messages, session_id)
+        
+        return ORJSONResponse(
+            content={"responses": [_build_chat_response(result) for result in results]},
+            headers=response.headers
+        )
+    
+    except Exception as e:
+        logger.error(f"Batch chat error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Batch chat processing failed: {str(e)}")
+
+def _resolve_session_id(header_id: Optional[str], cookie_id: Optional[str], response: Response) -> str:
+    """
+    Identify the chat session from the X-Session-ID header or the session cookie.
+    New visitors get a random session ID stored in a cookie.
+    """
+    if header_id:
+        return header_id
+    if cookie_id:
+        return cookie_id
+    
+    session_id = uuid.uuid4().hex
+    response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite="lax")
+    return session_id
+
+def _json_response(model: BaseModel) -> Response:
+    """
+    Serialize a response model with pydantic-core directly.
+    Returning a Response skips FastAPI's second validation and encoding pass.
+    """
+    return Response(content=model.model_dump_json(), media_type="application/json")
+
+def _build_search_response(query: str, result: dict) -> SearchResponse:
+    """Convert a service search result into the API response model"""
+    return SearchResponse(
+        query=query,
+        products=result.get("products", []),
+        explanation=result.get("explanation", ""),
+        search_id=result.get("search_id", "")
+    )
+
+def _build_chat_response(response: dict) -> dict:
+    """
+    Convert a service chat result into the API response payload.
+    The result only holds service-built primitives, so it is returned as an
+    ORJSONResponse directly instead of going through jsonable_encoder.
+    """
+    return {
+        "response": response.get("message", "I'm sorry, I couldn't process your request."),
+        "has_products": response.get("has_products", False),
+        "products": response.get("products", []),
+        "filter_options": response.get("filter_options", []),
+        "filter_name": response.get("filter_name", ""),
+        "timestamp": _format_timestamp(response.get("timestamp"))
+    }
+
+def _format_timestamp(timestamp: Optional[float]) -> Optional[str]:
+    """
+    Service results carry epoch-second timestamps; the API reports them as
+    local ISO 8601 strings, as it did when the service returned datetimes.
+    """
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp).isoformat()
+
+# Pre-serialized so frequent load balancer probes skip encoding.
+# A fresh Response is built per request, as middleware may edit its headers.
+HEALTH_BODY = b'{"status":"healthy","service":"AI Shopping Agent"}'
+
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "AI Shopping Agent"}
+    return Response(content=HEALTH_BODY, media_type="application/json")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=5000)
+    # uvicorn picks uvloop/httptools automatically when installed (uvicorn[standard]).
+    # Chat sessions are held in process memory, so only raise WEB_CONCURRENCY
+    # behind a load balancer with sticky sessions.
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=5000,
+        workers=int(os.getenv("WEB_CONCURRENCY", "1"))
+    )
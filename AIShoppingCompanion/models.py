@@ -23,17 +23,26 @@ class Product(BaseModel):
 
 class SearchResponse(BaseModel):
     query: str = Field(..., description="Original search query")
-    products: List[Product] = Field(default=[], description="List of recommended products")
+    products: List[Product] = Field(default_factory=list, description="List of recommended products")
     explanation: str = Field(..., description="Overall explanation of the search results")
     search_id: str = Field(..., description="Unique search identifier")
     timestamp: datetime = Field(default_factory=datetime.now)
 
+class BatchSearchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=20, description="Natural language search queries (1-20)")
+
+class BatchSearchResponse(BaseModel):
+    results: List[SearchResponse] = Field(default_factory=list, description="Search results in the same order as the queries")
+
 class ChatMessage(BaseModel):
     content: str = Field(..., description="Chat message content")
     timestamp: Optional[datetime] = Field(default_factory=datetime.now)
 
+class BatchChatRequest(BaseModel):
+    messages: List[str] = Field(..., min_length=1, max_length=20, description="Chat messages, processed in order (1-20)")
+
 class ChatResponse(BaseModel):
     message: str = Field(..., description="AI agent response")
     has_products: bool = Field(default=False, description="Whether response includes product recommendations")
-    products: List[Product] = Field(default=[], description="Product recommendations if applicable")
+    products: List[Product] = Field(default_factory=list, description="Product recommendations if applicable")
     timestamp: datetime = Field(default_factory=datetime.now)
@@ -1,14 +1,425 @@
 import os
-import json
 import asyncio
 import aiohttp
-from typing import Dict, List, Any, Optional
+import functools
+import orjson
+import hashlib
+import heapq
+import itertools
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple
 import logging
-from datetime import datetime
+import random
+import re
+import secrets
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from types import MappingProxyType
 import uuid
+import yarl
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # Optional: only needed when REDIS_URL is set
+    redis_asyncio = None
 
 logger = logging.getLogger(__name__)
 
+# Maximum concurrent per-product analysis requests (keeps within provider rate limits)
+ANALYSIS_CONCURRENCY = 8
+
+# Maximum concurrent SerpAPI requests, e.g. while a batch of searches runs (keeps within SerpAPI rate limits)
+SERPAPI_CONCURRENCY = 5
+
+# Retries after a SerpAPI 429 before falling back, with exponential backoff within a total wait budget
+SERPAPI_RATE_LIMIT_RETRIES = 2
+SERPAPI_RETRY_BASE_DELAY = 0.5  # seconds
+SERPAPI_RETRY_BUDGET = 2.5  # seconds
+
+# Chat product results cache (keyed by product keyword + selected filters)
+CHAT_CACHE_SIZE = 4096
+CHAT_CACHE_TTL = 600  # seconds
+
+# Chat sessions kept in memory; the least recently active are dropped first
+MAX_USER_SESSIONS = 10_000
+
+# Search results cache (keyed by normalized query)
+SEARCH_CACHE_SIZE = 1024
+SEARCH_CACHE_TTL = 600  # seconds
+
+# SerpAPI response cache (keyed by request params); shopping results change slowly
+SERPAPI_CACHE_SIZE = 1024
+SERPAPI_CACHE_TTL = 600  # seconds
+
+# Connect and command timeouts for the shared Redis cache, so a slow or unreachable host costs a miss, not a stalled search
+REDIS_TIMEOUT = 0.5  # seconds
+
+# Filler words ignored when matching repeated search queries
+QUERY_STOPWORDS = frozenset({
+    "a", "an", "the", "i", "me", "my", "need", "want", "looking", "for", "find",
+    "show", "get", "buy", "some", "please", "with", "of", "to", "in", "and"
+})
+QUERY_TOKEN_PATTERN = re.compile(r"\w+")
+
+# Common product categories, in priority order: the first one contained in a message wins
+PRODUCT_KEYWORDS = [
+    "smartphone", "phone", "mobile", "iphone", "android",
+    "laptop", "computer", "macbook", "chromebook",
+    "speakers", "speaker", "bluetooth speaker",
+    "earphones", "headphones", "earbuds", "airpods",
+    "tablet", "ipad",
+    "watch", "smartwatch", "fitness tracker",
+    "camera", "dslr", "mirrorless",
+    "tv", "television", "smart tv",
+    "mouse", "keyboard", "webcam",
+    "charger", "power bank", "cable",
+    "case", "cover", "screen protector"
+]
+
+# Words suggesting a message is asking for a product search
+SEARCH_INTENT_KEYWORDS = [
+    "buy", "purchase", "find", "looking for", "need", "want", "search",
+    "recommend", "suggest", "best", "cheap", "expensive", "under", "above",
+    "smartphone", "laptop", "watch", "headphones", "shoes", "clothes"
+]
+
+def _keyword_pattern(keywords: List[str]) -> "re.Pattern[str]":
+    """Compile keywords into one alternation, longest first so the longest keyword at a position wins"""
+    return re.compile("|".join(re.escape(keyword) for keyword in sorted(keywords, key=len, reverse=True)))
+
+SEARCH_INTENT_PATTERN = _keyword_pattern(SEARCH_INTENT_KEYWORDS)
+
+# Conversational replies
+GREETING_REPLY = "Hello! I'm your AI Shopping Agent. I can help you find products based on your needs. Just tell me what you're looking for!"
+THANKS_REPLY = "You're welcome! Is there anything else I can help you find today?"
+HELP_REPLY = "I can help you find products by understanding your natural language queries. For example, you can say 'I need a smartphone under ₹20000 with good camera' and I'll find the best options for you!"
+DEFAULT_CONVERSATION_REPLY = "I'm here to help you find products! Could you tell me what you're looking for? I can search for electronics, clothing, accessories, and much more."
+
+# Keywords that pick a conversational reply; earlier categories take precedence
+CONVERSATION_KEYWORDS = {
+    "greeting": ["hello", "hi", "hey", "good morning", "good afternoon", "good evening"],
+    "thanks": ["thank you", "thanks", "appreciate"],
+    "help": ["help", "how", "what can you do"]
+}
+CONVERSATION_CATEGORY_BY_KEYWORD = {
+    keyword: category for category, keywords in CONVERSATION_KEYWORDS.items() for keyword in keywords
+}
+CONVERSATION_PRIORITY = {category: priority for priority, category in enumerate(CONVERSATION_KEYWORDS)}
+CONVERSATION_REPLIES = {"greeting": GREETING_REPLY, "thanks": THANKS_REPLY, "help": HELP_REPLY}
+# Messages that are just one keyword are answered directly
+CANNED_REPLIES = {
+    keyword: CONVERSATION_REPLIES[category] for keyword, category in CONVERSATION_CATEGORY_BY_KEYWORD.items()
+}
+# Single words are looked up in the message's word set; phrases need a whole-word match
+CONVERSATION_WORD_CATEGORIES = {
+    keyword: category for keyword, category in CONVERSATION_CATEGORY_BY_KEYWORD.items() if " " not in keyword
+}
+CONVERSATION_PHRASE_PATTERN = re.compile(
+    r"\b(?:" + "|".join(re.escape(keyword) for keyword in CONVERSATION_CATEGORY_BY_KEYWORD if " " in keyword) + r")\b"
+)
+
+# Brands recognized in search queries
+KNOWN_BRANDS = [
+    "Samsung", "Apple", "OnePlus", "Xiaomi", "Realme", "Oppo", "Vivo", "Google", "Nothing",
+    "HP", "Dell", "Lenovo", "Asus", "Acer", "MSI", "JBL", "Sony", "Bose", "Marshall",
+    "Ultimate Ears", "Boat", "Portronics", "Sennheiser"
+]
+BRAND_PATTERN = re.compile(r"\b(?:" + "|".join(re.escape(brand.lower()) for brand in KNOWN_BRANDS) + r")\b")
+BRAND_BY_NAME = {brand.lower(): brand for brand in KNOWN_BRANDS}
+
+# Product type of a search query: the earliest whole-word product keyword, longest first,
+# so "headphones" isn't read as "phone" nor "iphone 15" as "phone"
+PRODUCT_TYPE_PATTERN = re.compile(
+    r"\b(?:" + "|".join(re.escape(keyword) for keyword in sorted(PRODUCT_KEYWORDS, key=len, reverse=True)) + r")\b"
+)
+
+# Price bounds such as "under ₹20,000", "below 20k" or "above Rs 5000"
+PRICE_BOUND_PATTERN = re.compile(
+    r"\b(under|below|less than|within|upto|up to|above|over|more than)\s*(?:₹|rs\.?|inr)?\s*(\d[\d,]*)\s*(k)?\b"
+)
+PRICE_UPPER_BOUNDS = {"under", "below", "less than", "within", "upto", "up to"}
+
+# Characters dropped from a display price such as "₹38,999" to get its digits
+PRICE_STRIP_TABLE = str.maketrans("", "", "₹, ")
+
+# Price ranges such as "₹5,000 - ₹10,000"
+PRICE_RANGE_PATTERN = re.compile(r"(?:₹|rs\.?)?\s*(\d[\d,]*)\s*-\s*(?:₹|rs\.?)?\s*(\d[\d,]*)")
+
+# Product keywords that share filter steps and fallback products
+PRODUCT_CATEGORIES = {
+    **dict.fromkeys(["smartphone", "phone", "mobile", "iphone", "android"], "phone"),
+    **dict.fromkeys(["laptop", "computer", "macbook", "chromebook"], "laptop"),
+    **dict.fromkeys(["speakers", "speaker", "bluetooth speaker"], "speaker"),
+    **dict.fromkeys(["earphones", "headphones", "earbuds", "airpods"], "audio")
+}
+
+# Filter steps offered in chat, asked one at a time
+FILTERS_BY_CATEGORY = {
+    "phone": (
+        {
+            "name": "Brand",
+            "param": "brand",
+            "options": ("Samsung", "Apple", "OnePlus", "Xiaomi", "Realme", "Oppo", "Vivo", "Google", "Nothing")
+        },
+        {
+            "name": "Price Range",
+            "param": "price",
+            "options": ("Under ₹10,000", "₹10,000 - ₹20,000", "₹20,000 - ₹40,000", "₹40,000 - ₹60,000", "Above ₹60,000")
+        },
+        {
+            "name": "Storage",
+            "param": "storage",
+            "options": ("64GB", "128GB", "256GB", "512GB", "1TB")
+        },
+        {
+            "name": "RAM",
+            "param": "ram",
+            "options": ("4GB", "6GB", "8GB", "12GB", "16GB")
+        }
+    ),
+    "laptop": (
+        {
+            "name": "Brand",
+            "param": "brand",
+            "options": ("HP", "Dell", "Lenovo", "Asus", "Acer", "Apple", "MSI", "Samsung")
+        },
+        {
+            "name": "Price Range",
+            "param": "price",
+            "options": ("Under ₹30,000", "₹30,000 - ₹50,000", "₹50,000 - ₹80,000", "₹80,000 - ₹1,20,000", "Above ₹1,20,000")
+        },
+        {
+            "name": "Processor",
+            "param": "processor",
+            "options": ("Intel Core i3", "Intel Core i5", "Intel Core i7", "Intel Core i9", "AMD Ryzen 5", "AMD Ryzen 7", "Apple M1/M2")
+        },
+        {
+            "name": "RAM",
+            "param": "ram",
+            "options": ("4GB", "8GB", "16GB", "32GB")
+        }
+    ),
+    "speaker": (
+        {
+            "name": "Brand",
+            "param": "brand",
+            "options": ("JBL", "Sony", "Bose", "Marshall", "Ultimate Ears", "Boat", "Portronics")
+        },
+        {
+            "name": "Price Range",
+            "param": "price",
+            "options": ("Under ₹2,000", "₹2,000 - ₹5,000", "₹5,000 - ₹10,000", "₹10,000 - ₹20,000", "Above ₹20,000")
+        },
+        {
+            "name": "Connectivity",
+            "param": "connectivity",
+            "options": ("Bluetooth", "Wi-Fi", "Wired", "Multi-room")
+        }
+    ),
+    "audio": (
+        {
+            "name": "Brand",
+            "param": "brand",
+            "options": ("Apple", "Sony", "Bose", "JBL", "Sennheiser", "Boat", "OnePlus", "Samsung")
+        },
+        {
+            "name": "Price Range",
+            "param": "price",
+            "options": ("Under ₹1,500", "₹1,500 - ₹5,000", "₹5,000 - ₹10,000", "₹10,000 - ₹20,000", "Above ₹20,000")
+        },
+        {
+            "name": "Type",
+            "param": "type",
+            "options": ("True Wireless", "Wireless", "Wired", "Over-ear", "On-ear", "In-ear")
+        },
+        {
+            "name": "Features",
+            "param": "features",
+            "options": ("Active Noise Cancellation", "Wireless Charging", "Water Resistant", "Gaming", "Sports")
+        }
+    )
+}
+
+# Filter steps for products without a known category
+DEFAULT_FILTERS = (
+    {
+        "name": "Price Range",
+        "param": "price",
+        "options": ("Under ₹1,000", "₹1,000 - ₹5,000", "₹5,000 - ₹10,000", "₹10,000 - ₹25,000", "Above ₹25,000")
+    },
+    {
+        "name": "Brand",
+        "param": "brand",
+        "options": ("Popular Brands", "Premium Brands", "Budget Brands")
+    }
+)
+
+# Brand choices that don't name a brand, so they don't narrow the search
+GENERIC_BRAND_OPTIONS = frozenset({"Popular Brands", "Premium Brands", "Budget Brands"})
+
+# Bulleted option lists shown in the chat prompt for each filter step
+for _filters in (*FILTERS_BY_CATEGORY.values(), DEFAULT_FILTERS):
+    for _filter in _filters:
+        _filter["options_text"] = "\n".join(f"• {option}" for option in _filter["options"])
+del _filters, _filter
+
+@functools.lru_cache(maxsize=256)
+def _parse_price_filter(price_filter: str) -> Tuple[Optional[int], Optional[int]]:
+    """(min, max) price of a price filter choice such as "Under ₹20,000" or "₹5,000 - ₹10,000"; None where unbounded"""
+    text = price_filter.lower()
+    
+    range_match = PRICE_RANGE_PATTERN.search(text)
+    if range_match:
+        return int(range_match.group(1).replace(",", "")), int(range_match.group(2).replace(",", ""))
+    
+    bound_match = PRICE_BOUND_PATTERN.search(text)
+    if bound_match:
+        bound, amount, thousands = bound_match.groups()
+        value = int(amount.replace(",", "")) * (1000 if thousands else 1)
+        return (None, value) if bound in PRICE_UPPER_BOUNDS else (value, None)
+    
+    return None, None
+
+@functools.lru_cache(maxsize=1024)
+def _price_value(price: str) -> Optional[int]:
+    """Whole-rupee value of a display price such as "₹38,999"; None when it isn't a plain amount"""
+    digits = price.translate(PRICE_STRIP_TABLE)
+    return int(digits) if digits.isdecimal() else None
+
+def _brand_query_term(brand: str) -> str:
+    """Brand filter as search query text; the generic brand options add nothing"""
+    return "" if brand in GENERIC_BRAND_OPTIONS else brand
+
+def _price_query_term(price_filter: str) -> str:
+    """Price filter option as search query text"""
+    min_price, max_price = _parse_price_filter(price_filter)
+    if min_price is None and max_price is not None:
+        return f"under {max_price}"
+    if "-" in price_filter:
+        return price_filter.replace("₹", "Rs ")
+    return ""
+
+# Search query text for each chosen filter, in the order it is appended to the keyword
+FILTER_QUERY_BUILDERS = {
+    "brand": _brand_query_term,
+    "price": _price_query_term,
+    "storage": lambda storage: storage,
+    "ram": lambda ram: f"{ram} RAM",
+    "processor": lambda processor: processor,
+    "type": lambda product_type: product_type,
+    "features": lambda features: features,
+    "connectivity": lambda connectivity: connectivity
+}
+
+# Sample products shown when live search is unavailable
+FALLBACK_PRODUCTS_BY_CATEGORY = {
+    "phone": (
+        {
+            "title": "Samsung Galaxy A54 5G (Awesome Blue, 128GB)",
+            "price": "₹38,999",
+            "description": "6.4-inch Super AMOLED display, 50MP triple camera, 5000mAh battery",
+            "image_url": "https://images.samsung.com/is/image/samsung/p6pim/in/2202/gallery/in-galaxy-a54-5g-a546-sm-a546elvcins-534851043",
+            "rating": 4.3,
+            "reviews_count": 15420,
+            "source": "Amazon",
+            "url": "https://amazon.in",
+        },
+        {
+            "title": "Realme 11 Pro+ 5G (Oasis Green, 256GB)",
+            "price": "₹31,999",
+            "description": "6.7-inch curved AMOLED, 200MP camera, 100W SuperVOOC charging",
+            "image_url": "https://image01.realme.net/general/20230510/1683709141064.jpg",
+            "rating": 4.2,
+            "reviews_count": 8934,
+            "source": "Flipkart",
+            "url": "https://flipkart.com",
+        }
+    ),
+    "laptop": (
+        {
+            "title": "HP Pavilion 15 Intel Core i5 12th Gen Laptop",
+            "price": "₹56,999",
+            "description": "15.6-inch FHD, 8GB RAM, 512GB SSD, Windows 11",
+            "image_url": "https://ssl-product-images.www8-hp.com/digmedialib/prodimg/lowres/c08140467.png",
+            "rating": 4.1,
+            "reviews_count": 2341,
+            "source": "HP Store",
+            "url": "https://hp.com",
+        },
+    )
+}
+
+def _rate_limit_delay(retry_after: Optional[str], attempt: int) -> float:
+    """Seconds to wait after a 429: the Retry-After value when given in seconds, otherwise exponential backoff with jitter"""
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass  # HTTP-date form; use backoff instead
+    return SERPAPI_RETRY_BASE_DELAY * 2 ** attempt + random.uniform(0, SERPAPI_RETRY_BASE_DELAY / 2)
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries expire after a fixed number of seconds"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    def get(self, key: Any) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] >= self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: Any, value: Any):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+@dataclass(slots=True)
+class CandidateProduct:
+    """
+    Product candidate passed between the search, analysis and ranking steps.
+    Only the products returned to the client are converted to dicts.
+    """
+    title: str = ""
+    price: str = ""
+    description: str = ""
+    image_url: str = ""
+    rating: Optional[float] = None
+    reviews_count: Optional[int] = None
+    source: str = ""
+    url: str = ""
+    relevance_score: Optional[float] = None
+    explanation: Optional[str] = None
+    raw_data: Optional[Dict[str, Any]] = field(default=None, repr=False)
+
+    @classmethod
+    def from_serpapi(cls, result: Dict[str, Any]) -> "CandidateProduct":
+        """Build a candidate from a SerpAPI shopping result"""
+        return cls(
+            title=result.get("title", ""),
+            price=result.get("price", ""),
+            description=result.get("snippet", ""),
+            image_url=result.get("thumbnail", ""),
+            rating=result.get("rating"),
+            reviews_count=result.get("reviews"),
+            source=result.get("source", ""),
+            url=result.get("link", ""),
+            # The full upstream result is many times larger than the fields above; keep it only for debugging
+            raw_data=result if logger.isEnabledFor(logging.DEBUG) else None
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict for JSON responses"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
 class AIShoppingService:
     def __init__(self):
         # API Keys from environment variables
@@ -17,45 +428,140 @@ class AIShoppingService:
         self.together_api_key = os.getenv("TOGETHER_API_KEY", "")
         self.openrouter_api_key = os.getenv("OPENROUTER_API_KEY", "")
         
+        # Optional Redis shared by all workers as a second-level SerpAPI cache
+        self.redis_url = os.getenv("REDIS_URL", "")
+        
         # API Endpoints
         self.phi3_endpoint = "https://api.together.xyz/v1/chat/completions"
         self.serpapi_endpoint = "https://serpapi.com/search"
         self.together_endpoint = "https://api.together.xyz/v1/chat/completions"
         
-        # User sessions to track filter conversations
-        self.user_sessions = {}
+        # Parsed once; each request only adds its query string
+        self._serpapi_url = yarl.URL(self.serpapi_endpoint)
+        
+        # Params shared by every SerpAPI Google Shopping request
+        self._serpapi_base_params = MappingProxyType({
+            "engine": "google_shopping",
+            "api_key": self.serpapi_key,
+            "num": 10,  # Reduced to avoid rate limits
+            "gl": "in",  # India
+            "hl": "en"
+        })
+        
+        # Shared HTTP session so outbound API calls reuse pooled connections
+        self._http_session: Optional[aiohttp.ClientSession] = None
+        
+        # Product IDs: random per-process prefix plus a counter, avoiding a urandom call per product
+        self._product_id_prefix = secrets.token_hex(4)
+        self._product_id_counter = itertools.count()
+        
+        # User sessions to track filter conversations (LRU order, bounded by MAX_USER_SESSIONS)
+        self.user_sessions = OrderedDict()
+        
+        # Caches for repeated searches
+        self.chat_results_cache = TTLCache(CHAT_CACHE_SIZE, CHAT_CACHE_TTL)
+        self.search_results_cache = TTLCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
+        self.serpapi_results_cache = TTLCache(SERPAPI_CACHE_SIZE, SERPAPI_CACHE_TTL)
+        
+        # Shared SerpAPI cache, checked after the in-process one
+        self._redis = None
+        if self.redis_url:
+            if redis_asyncio is None:
+                logger.warning("REDIS_URL is set but the redis package is not installed; using the in-process cache only")
+            else:
+                self._redis = redis_asyncio.from_url(
+                    self.redis_url,
+                    socket_connect_timeout=REDIS_TIMEOUT,
+                    socket_timeout=REDIS_TIMEOUT
+                )
+        
+        # SerpAPI requests in progress, so concurrent identical searches share one call
+        self._serpapi_inflight: Dict[Tuple, asyncio.Task] = {}
+        self._serpapi_semaphore = asyncio.Semaphore(SERPAPI_CONCURRENCY)
         
         if not self.serpapi_key:
             logger.warning("SerpAPI key not found in environment variables")
         if not self.together_api_key and not self.openrouter_api_key:
             logger.warning("No AI service API keys found in environment variables")
 
+    async def _get_http_session(self) -> aiohttp.ClientSession:
+        """Return the shared HTTP session, creating it on first use (it needs a running event loop)"""
+        if self._http_session is None or self._http_session.closed:
+            self._http_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=200, limit_per_host=100, ttl_dns_cache=300, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=30),
+                json_serialize=lambda obj: orjson.dumps(obj).decode()
+            )
+        return self._http_session
+
+    async def warm_up(self):
+        """Prepare shared resources at startup so the first request doesn't pay for them"""
+        await self._get_http_session()
+
+    async def close(self):
+        """Close the shared HTTP session and Redis connections"""
+        if self._http_session and not self._http_session.closed:
+            await self._http_session.close()
+        if self._redis is not None:
+            await self._redis.aclose()
+
     async def process_search_query(self, query: str) -> Dict[str, Any]:
         """
         Process a natural language search query and return product recommendations
         """
+        # Repeated queries (ignoring word order and filler words) reuse earlier results
+        cache_key = self._normalize_query(query)
+        cached = self.search_results_cache.get(cache_key)
+        if cached is not None:
+            products, total = cached
+            return {
+                "products": products,
+                "explanation": f"Found {total} products matching your criteria: {query}",
+                "search_id": uuid.uuid4().hex
+            }
+        
         try:
-            # Step 1: Parse query with Phi-3 Mini Instruct
-            parsed_query = await self._parse_query_with_phi3(query)
+            # Steps 1 & 2: Parse query with Phi-3 Mini Instruct while searching SerpAPI with the raw query
+            parsed_query, search_results = await asyncio.gather(
+                self._parse_query_with_phi3(query),
+                self._search_products_with_serpapi({"product_type": query})
+            )
             
-            # Step 2: Search for products using SerpAPI
-            search_results = await self._search_products_with_serpapi(parsed_query)
+            # Retry with the parsed brand, product and price if the raw query found little.
+            # A rate-limited first call has already backed off, so don't queue a second round.
+            rate_limited = search_results is None
+            search_results = search_results or []
+            retry_query = self._parsed_search_query(parsed_query)
+            if (
+                not rate_limited
+                and len(search_results) < 3
+                and retry_query
+                and self._normalize_query(retry_query) != self._normalize_query(query)
+            ):
+                retry_results = await self._search_products_with_serpapi({"product_type": retry_query})
+                if retry_results and len(retry_results) > len(search_results):
+                    search_results = retry_results
             
             # If no results from SerpAPI (rate limited), use fallback
-            if not search_results:
+            from_serpapi = bool(search_results)
+            if not from_serpapi:
                 logger.warning("Using fallback due to SerpAPI rate limit")
                 search_results = self._get_fallback_products(query)
             
             # Step 3: Analyze and score products with AI
             analyzed_products = await self._analyze_products_with_ai(search_results, query)
             
-            # Step 4: Rank and format results
-            ranked_products = self._rank_products(analyzed_products)
+            # Step 4: Rank and format the top 10 results
+            ranked_products = self._rank_products(analyzed_products, limit=10)
+            
+            # Only cache real search results so fallbacks are retried
+            if from_serpapi:
+                self.search_results_cache.set(cache_key, (ranked_products, len(analyzed_products)))
             
             return {
-                "products": ranked_products[:10],  # Top 10 results
-                "explanation": f"Found {len(ranked_products)} products matching your criteria: {query}",
-                "search_id": str(uuid.uuid4())
+                "products": ranked_products,
+                "explanation": f"Found {len(analyzed_products)} products matching your criteria: {query}",
+                "search_id": uuid.uuid4().hex
             }
             
         except Exception as e:
@@ -64,139 +570,271 @@ class AIShoppingService:
             try:
                 fallback_products = self._get_fallback_products(query)
                 analyzed_products = await self._analyze_products_with_ai(fallback_products, query)
-                ranked_products = self._rank_products(analyzed_products)
+                ranked_products = self._rank_products(analyzed_products, limit=10)
                 
                 return {
-                    "products": ranked_products[:10],
+                    "products": ranked_products,
                     "explanation": f"Showing sample results for: {query} (API temporarily unavailable)",
-                    "search_id": str(uuid.uuid4())
+                    "search_id": uuid.uuid4().hex
                 }
             except:
                 return {
                     "products": [],
                     "explanation": f"Sorry, I encountered an error while searching: {str(e)}",
-                    "search_id": str(uuid.uuid4())
+                    "search_id": uuid.uuid4().hex
                 }
 
+    def _parsed_search_query(self, parsed_query: Dict[str, Any]) -> str:
+        """Search text rebuilt from a parsed query's brand, product type and price bound; empty without a product type"""
+        product_type = parsed_query.get("product_type")
+        if not isinstance(product_type, str) or not product_type.strip():
+            return ""
+        
+        terms = []
+        brand = parsed_query.get("brand_preference")
+        if isinstance(brand, str) and brand.strip() and brand.strip().lower() not in product_type.lower():
+            terms.append(brand.strip())
+        terms.append(product_type.strip())
+        
+        price_range = parsed_query.get("price_range")
+        if isinstance(price_range, dict):
+            max_price, min_price = price_range.get("max"), price_range.get("min")
+            if isinstance(max_price, (int, float)):
+                terms.append(f"under {int(max_price)}")
+            elif isinstance(min_price, (int, float)):
+                terms.append(f"above {int(min_price)}")
+        
+        return " ".join(terms)
+
+    def _normalize_query(self, query: str) -> Tuple[str, ...]:
+        """Canonical form of a search query: lowercased words without filler words, in sorted order"""
+        tokens = QUERY_TOKEN_PATTERN.findall(query.lower().replace(",", ""))
+        return tuple(sorted(set(token for token in tokens if token not in QUERY_STOPWORDS)))
+
+    async def process_search_batch(self, queries: List[str]) -> List[Dict[str, Any]]:
+        """
+        Process several search queries concurrently, running identical queries only once
+        """
+        unique_queries = list(dict.fromkeys(queries))
+        results = await asyncio.gather(*[self.process_search_query(query) for query in unique_queries])
+        results_by_query = dict(zip(unique_queries, results))
+        
+        return [results_by_query[query] for query in queries]
+
     async def process_chat_message(self, message: str, session_id: str = "default") -> Dict[str, Any]:
         """
         Process a conversational message with interactive filter-based search
         """
         try:
-            # Initialize session if new
-            if session_id not in self.user_sessions:
-                self.user_sessions[session_id] = {
-                    "stage": "initial",
-                    "product_keyword": None,
-                    "current_filters": {},
-                    "available_filters": [],
-                    "current_filter_index": 0
-                }
+            response, pending_search = await self._advance_chat_session(message, session_id)
+            if pending_search:
+                response["products"] = await self._search_chat_products(*pending_search)
             
-            session = self.user_sessions[session_id]
+            return response
+                
+        except Exception as e:
+            logger.error(f"Error processing chat message: {str(e)}")
+            return self._chat_error_response()
+
+    async def stream_chat_message(self, message: str, session_id: str = "default") -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Process a conversational message, yielding the reply before any product search finishes.
+        Yields ("message", response) ahead of a product search, then ("done", response).
+        """
+        try:
+            response, pending_search = await self._advance_chat_session(message, session_id)
+            if pending_search:
+                yield "message", dict(response)
+                response["products"] = await self._search_chat_products(*pending_search)
             
-            # Extract product keyword if in initial stage
-            if session["stage"] == "initial":
-                keyword = await self._extract_product_keyword(message)
-                if keyword:
-                    session["product_keyword"] = keyword
-                    session["stage"] = "getting_filters"
-                    
-                    # Get available filters for this product category
-                    filters = await self._get_available_filters(keyword)
-                    session["available_filters"] = filters
-                    
-                    if filters:
-                        current_filter = filters[0]
-                        return {
-                            "message": f"Great! I found filters for {keyword}. Let's refine your search step by step.\n\n**{current_filter['name']}**: Please choose from these options:\n" + 
-                                     "\n".join([f"• {opt}" for opt in current_filter['options']]),
-                            "has_products": False,
-                            "products": [],
-                            "timestamp": datetime.now(),
-                            "filter_options": current_filter['options'],
-                            "filter_name": current_filter['name']
-                        }
-                    else:
-                        # No filters available, proceed with basic search
-                        results = await self._search_with_keyword(keyword)
-                        return {
-                            "message": f"Here are the search results for {keyword}:",
-                            "has_products": True,
-                            "products": results,
-                            "timestamp": datetime.now()
-                        }
+            yield "done", response
+                
+        except Exception as e:
+            logger.error(f"Error streaming chat message: {str(e)}")
+            yield "done", self._chat_error_response()
+
+    def _chat_error_response(self) -> Dict[str, Any]:
+        """Response used when a chat message can't be processed"""
+        return {
+            "message": "I'm sorry, I encountered an error. Let's start fresh - what product are you looking for?",
+            "has_products": False,
+            "products": [],
+            "timestamp": time.time()
+        }
+
+    def _get_session(self, session_id: str) -> Dict[str, Any]:
+        """Get the chat session, creating it if new and evicting the least recently active beyond the cap"""
+        session = self.user_sessions.get(session_id)
+        if session is None:
+            session = self.user_sessions[session_id] = self._new_session()
+            if len(self.user_sessions) > MAX_USER_SESSIONS:
+                self.user_sessions.popitem(last=False)
+        else:
+            self.user_sessions.move_to_end(session_id)
+        return session
+
+    def _new_session(self) -> Dict[str, Any]:
+        """Fresh filter conversation state"""
+        return {
+            "stage": "initial",
+            "product_keyword": None,
+            "current_filters": {},
+            "available_filters": [],
+            "current_filter_index": 0
+        }
+
+    async def _advance_chat_session(self, message: str, session_id: str) -> Tuple[Dict[str, Any], Optional[Tuple[str, Dict[str, str]]]]:
+        """
+        Advance the session's filter conversation by one message.
+        Returns the response and, when the turn ends in a product search, the (keyword, filters) to search with.
+        """
+        session = self._get_session(session_id)
+        
+        # Extract product keyword if in initial stage
+        if session["stage"] == "initial":
+            keyword = self._extract_product_keyword(message)
+            if keyword:
+                session["product_keyword"] = keyword
+                session["stage"] = "getting_filters"
+                
+                # Get available filters for this product category
+                filters = self._get_available_filters(keyword)
+                session["available_filters"] = filters
+                
+                if filters:
+                    current_filter = filters[0]
+                    return {
+                        "message": f"Great! I found filters for {keyword}. Let's refine your search step by step.\n\n**{current_filter['name']}**: Please choose from these options:\n" + current_filter['options_text'],
+                        "has_products": False,
+                        "products": [],
+                        "timestamp": time.time(),
+                        "filter_options": current_filter['options'],
+                        "filter_name": current_filter['name']
+                    }, None
                 else:
+                    # No filters available, proceed with basic search
                     return {
-                        "message": "I'd like to help you find products! Please tell me what you're looking for (e.g., smartphone, speakers, earphones, laptop, etc.)",
+                        "message": f"Here are the search results for {keyword}:",
+                        "has_products": True,
+                        "products": [],
+                        "timestamp": time.time()
+                    }, (keyword, {})
+            else:
+                # Greetings, thanks and help requests get their own reply instead of the prompt
+                reply = self._match_conversational_reply(message)
+                return {
+                    "message": reply or "I'd like to help you find products! Please tell me what you're looking for (e.g., smartphone, speakers, earphones, laptop, etc.)",
+                    "has_products": False,
+                    "products": [],
+                    "timestamp": time.time()
+                }, None
+        
+        # Handle filter selection
+        elif session["stage"] == "getting_filters":
+            filter_index = session["current_filter_index"]
+            if filter_index < len(session["available_filters"]):
+                current_filter = session["available_filters"][filter_index]
+                
+                # Store the user's choice
+                session["current_filters"][current_filter["param"]] = message.strip()
+                session["current_filter_index"] += 1
+                
+                # Check if there are more filters
+                if session["current_filter_index"] < len(session["available_filters"]):
+                    next_filter = session["available_filters"][session["current_filter_index"]]
+                    return {
+                        "message": f"**{next_filter['name']}**: Please choose from these options:\n" + next_filter['options_text'],
                         "has_products": False,
                         "products": [],
-                        "timestamp": datetime.now()
-                    }
-            
-            # Handle filter selection
-            elif session["stage"] == "getting_filters":
-                filter_index = session["current_filter_index"]
-                if filter_index < len(session["available_filters"]):
-                    current_filter = session["available_filters"][filter_index]
-                    
-                    # Store the user's choice
-                    session["current_filters"][current_filter["param"]] = message.strip()
-                    session["current_filter_index"] += 1
+                        "timestamp": time.time(),
+                        "filter_options": next_filter['options'],
+                        "filter_name": next_filter['name']
+                    }, None
+                else:
+                    # All filters collected: reset session for next search and hand back the search to run
+                    self.user_sessions[session_id] = self._new_session()
                     
-                    # Check if there are more filters
-                    if session["current_filter_index"] < len(session["available_filters"]):
-                        next_filter = session["available_filters"][session["current_filter_index"]]
-                        return {
-                            "message": f"**{next_filter['name']}**: Please choose from these options:\n" + 
-                                     "\n".join([f"• {opt}" for opt in next_filter['options']]),
-                            "has_products": False,
-                            "products": [],
-                            "timestamp": datetime.now(),
-                            "filter_options": next_filter['options'],
-                            "filter_name": next_filter['name']
-                        }
-                    else:
-                        # All filters collected, perform search
-                        session["stage"] = "searching"
-                        results = await self._search_with_filters(session["product_keyword"], session["current_filters"])
-                        
-                        # Reset session for next search
-                        self.user_sessions[session_id] = {
-                            "stage": "initial",
-                            "product_keyword": None,
-                            "current_filters": {},
-                            "available_filters": [],
-                            "current_filter_index": 0
-                        }
-                        
-                        return {
-                            "message": f"Here are your filtered results for {session['product_keyword']}:",
-                            "has_products": True,
-                            "products": results,
-                            "timestamp": datetime.now()
-                        }
-            
-            # Default conversational response
-            response_text = await self._generate_conversational_response(message)
-            return {
-                "message": response_text,
-                "has_products": False,
-                "products": [],
-                "timestamp": datetime.now()
-            }
-                
-        except Exception as e:
-            logger.error(f"Error processing chat message: {str(e)}")
-            return {
-                "message": "I'm sorry, I encountered an error. Let's start fresh - what product are you looking for?",
-                "has_products": False,
-                "products": [],
-                "timestamp": datetime.now()
-            }
+                    return {
+                        "message": f"Here are your filtered results for {session['product_keyword']}:",
+                        "has_products": True,
+                        "products": [],
+                        "timestamp": time.time()
+                    }, (session["product_keyword"], session["current_filters"])
+        
+        # Default conversational response
+        response_text = await self._generate_conversational_response(message)
+        return {
+            "message": response_text,
+            "has_products": False,
+            "products": [],
+            "timestamp": time.time()
+        }, None
+
+    async def process_chat_batch(self, messages: List[str], session_id: str = "default") -> List[Dict[str, Any]]:
+        """
+        Process several chat messages for one session in order.
+        Each message advances the session's filter conversation, so they cannot run concurrently.
+        """
+        responses = []
+        for message in messages:
+            responses.append(await self.process_chat_message(message, session_id))
+        
+        return responses
+
+    async def _search_chat_products(self, keyword: str, filters: Dict[str, str]) -> List[Dict[str, Any]]:
+        """Search for chat results, reusing cached results for repeated keyword/filter choices"""
+        cache_key = (keyword, tuple(sorted((key, value.strip().lower()) for key, value in filters.items())))
+        
+        cached = self.chat_results_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        if filters:
+            products, from_serpapi = await self._search_with_filters(keyword, filters)
+        else:
+            products = await self._search_with_keyword(keyword)
+            from_serpapi = bool(products)  # Empty when rate limited
+        results = [product.to_dict() for product in products]
+        
+        # Only cache real search results so fallbacks are retried
+        if from_serpapi:
+            self.chat_results_cache.set(cache_key, results)
+        
+        return results
+
+    def _rule_parse(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Parse a shopping query locally. Returns None when no product type is recognized,
+        in the same shape as the Phi-3 parse otherwise.
+        """
+        query_lower = query.lower()
+        
+        product_match = PRODUCT_TYPE_PATTERN.search(query_lower)
+        if not product_match:
+            return None
+        
+        price_range = None
+        price_match = PRICE_BOUND_PATTERN.search(query_lower)
+        if price_match:
+            bound, amount, thousands = price_match.groups()
+            value = int(amount.replace(",", "")) * (1000 if thousands else 1)
+            price_range = {"max": value} if bound in PRICE_UPPER_BOUNDS else {"min": value}
+        
+        brand_match = BRAND_PATTERN.search(query_lower)
+        
+        return {
+            "product_type": product_match.group(0),
+            "price_range": price_range,
+            "features": [],
+            "brand_preference": BRAND_BY_NAME[brand_match.group(0)] if brand_match else None
+        }
 
     async def _parse_query_with_phi3(self, query: str) -> Dict[str, Any]:
-        """Parse natural language query using Phi-3 Mini Instruct"""
+        """Parse natural language query, using Phi-3 Mini Instruct only when local rules can't"""
+        rule_parsed = self._rule_parse(query)
+        if rule_parsed:
+            return rule_parsed
+        
         if not self.phi3_api_key:
             # Fallback parsing without API
             return {
@@ -207,93 +845,145 @@ class AIShoppingService:
             }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                headers = {
-                    "Authorization": f"Bearer {self.phi3_api_key}",
-                    "Content-Type": "application/json"
-                }
+            session = await self._get_http_session()
+            headers = {
+                "Authorization": f"Bearer {self.phi3_api_key}",
+                "Content-Type": "application/json"
+            }
                 
-                prompt = f"""
-                Parse this shopping query and extract key information:
-                Query: "{query}"
+            prompt = f"""
+            Parse this shopping query and extract key information:
+            Query: "{query}"
                 
-                Return JSON with: product_type, price_range, features, brand_preference
-                """
+            Return JSON with: product_type, price_range, features, brand_preference
+            """
                 
-                payload = {
-                    "model": "microsoft/Phi-3-mini-4k-instruct",
-                    "messages": [{"role": "user", "content": prompt}],
-                    "max_tokens": 200
-                }
+            payload = {
+                "model": "microsoft/Phi-3-mini-4k-instruct",
+                "messages": [{"role": "user", "content": prompt}],
+                "max_tokens": 200
+            }
                 
-                async with session.post(self.phi3_endpoint, headers=headers, json=payload) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        content = data["choices"][0]["message"]["content"]
-                        try:
-                            return json.loads(content)
-                        except json.JSONDecodeError:
-                            logger.warning("Failed to parse Phi-3 response as JSON")
-                            return {"product_type": query}
-                    else:
-                        logger.error(f"Phi-3 API error: {response.status}")
+            async with session.post(self.phi3_endpoint, headers=headers, json=payload) as response:
+                if response.status == 200:
+                    data = orjson.loads(await response.read())
+                    content = data["choices"][0]["message"]["content"]
+                    try:
+                        return orjson.loads(content)
+                    except orjson.JSONDecodeError:
+                        logger.warning("Failed to parse Phi-3 response as JSON")
                         return {"product_type": query}
+                else:
+                    logger.error(f"Phi-3 API error: {response.status}")
+                    return {"product_type": query}
                         
         except Exception as e:
             logger.error(f"Error calling Phi-3 API: {str(e)}")
             return {"product_type": query}
 
-    async def _search_products_with_serpapi(self, parsed_query: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Search for products using SerpAPI Google Shopping"""
+    async def _search_products_with_serpapi(self, parsed_query: Dict[str, Any]) -> Optional[List[CandidateProduct]]:
+        """Search for products using SerpAPI Google Shopping. Returns None when rate limited."""
         if not self.serpapi_key:
             raise Exception("SerpAPI key not configured")
         
         try:
-            async with aiohttp.ClientSession() as session:
-                params = {
-                    "engine": "google_shopping",
-                    "q": parsed_query.get("product_type", ""),
-                    "api_key": self.serpapi_key,
-                    "num": 10,  # Reduced to avoid rate limits
-                    "gl": "in",  # India
-                    "hl": "en"
-                }
-                
-                async with session.get(self.serpapi_endpoint, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        shopping_results = data.get("shopping_results", [])
-                        
-                        products = []
-                        for result in shopping_results:
-                            product = {
-                                "title": result.get("title", ""),
-                                "price": result.get("price", ""),
-                                "description": result.get("snippet", ""),
-                                "image_url": result.get("thumbnail", ""),
-                                "rating": result.get("rating"),
-                                "reviews_count": result.get("reviews"),
-                                "source": result.get("source", ""),
-                                "url": result.get("link", ""),
-                                "raw_data": result
-                            }
-                            products.append(product)
-                        
-                        return products
-                    elif response.status == 429:
-                        # Rate limit exceeded - return empty list to trigger fallback
-                        logger.warning("SerpAPI rate limit exceeded")
-                        return []
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"SerpAPI error {response.status}: {error_text}")
-                        raise Exception(f"SerpAPI error: {response.status}")
+            params = {**self._serpapi_base_params, "q": parsed_query.get("product_type", "")}
+            
+            products = await self._fetch_serpapi_products(params)
+            if products is None:
+                # Rate limit exceeded - caller falls back
+                logger.warning("SerpAPI rate limit exceeded")
+            return products
                         
         except Exception as e:
             logger.error(f"Error calling SerpAPI: {str(e)}")
             raise
 
-    async def _analyze_products_with_ai(self, products: List[Dict[str, Any]], original_query: str) -> List[Dict[str, Any]]:
+    async def _fetch_serpapi_products(self, params: Dict[str, Any]) -> Optional[List[CandidateProduct]]:
+        """
+        Fetch Google Shopping results for the params, served from cache when fresh.
+        Concurrent calls with the same params share one request.
+        Returns None when rate limited and raises on other API errors.
+        """
+        cache_key = tuple(sorted((name, str(value)) for name, value in params.items() if name != "api_key"))
+        
+        products = self.serpapi_results_cache.get(cache_key)
+        if products is None:
+            task = self._serpapi_inflight.get(cache_key)
+            if task is None:
+                task = asyncio.ensure_future(self._request_serpapi_products(params, cache_key))
+                self._serpapi_inflight[cache_key] = task
+                task.add_done_callback(lambda _: self._serpapi_inflight.pop(cache_key, None))
+            # Shielded so one caller being cancelled doesn't cancel the request for the others
+            products = await asyncio.shield(task)
+            if products is None:
+                return None
+        
+        # Callers score products in place, so each gets its own copies
+        return [replace(product) for product in products]
+
+    async def _request_serpapi_products(self, params: Dict[str, Any], cache_key: Tuple) -> Optional[List[CandidateProduct]]:
+        """Call SerpAPI, unless another worker already cached the results in Redis, and cache successful results"""
+        redis_key = None
+        if self._redis is not None:
+            redis_key = "serp:" + hashlib.blake2b(orjson.dumps(cache_key), digest_size=16).hexdigest()
+            products = await self._get_shared_serpapi_products(redis_key)
+            if products is not None:
+                self.serpapi_results_cache.set(cache_key, products)
+                return products
+        
+        session = await self._get_http_session()
+        url = self._serpapi_url.with_query(params)
+        waited = 0.0
+        for attempt in range(SERPAPI_RATE_LIMIT_RETRIES + 1):
+            async with self._serpapi_semaphore, session.get(url) as response:
+                if response.status == 200:
+                    data = orjson.loads(await response.read())
+                    shopping_results = data.get("shopping_results", [])
+                    
+                    products = [CandidateProduct.from_serpapi(result) for result in shopping_results]
+                    self.serpapi_results_cache.set(cache_key, products)
+                    if redis_key is not None:
+                        await self._set_shared_serpapi_products(redis_key, products)
+                    return products
+                elif response.status != 429:
+                    error_text = await response.text()
+                    logger.error(f"SerpAPI error {response.status}: {error_text}")
+                    raise Exception(f"SerpAPI error: {response.status}")
+                delay = _rate_limit_delay(response.headers.get("Retry-After"), attempt)
+            
+            # Rate limited: wait and retry while within the retry budget, otherwise let the caller fall back
+            if attempt == SERPAPI_RATE_LIMIT_RETRIES or waited + delay > SERPAPI_RETRY_BUDGET:
+                return None
+            logger.warning(f"SerpAPI rate limited, retrying in {delay:.2f}s")
+            waited += delay
+            await asyncio.sleep(delay)
+
+    async def _get_shared_serpapi_products(self, redis_key: str) -> Optional[List[CandidateProduct]]:
+        """Products cached in Redis, or None on a miss, Redis error or unreadable entry"""
+        try:
+            cached = await self._redis.get(redis_key)
+        except Exception as e:
+            logger.warning(f"Redis cache read failed: {str(e)}")
+            return None
+        if cached is None:
+            return None
+        
+        # Entries written by an older or different version may not decode; treat them as a miss
+        try:
+            return [CandidateProduct(**product) for product in orjson.loads(cached)]
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable Redis cache entry: {str(e)}")
+            return None
+
+    async def _set_shared_serpapi_products(self, redis_key: str, products: List[CandidateProduct]):
+        """Store products in Redis; failures only cost a later cache miss"""
+        try:
+            await self._redis.set(redis_key, orjson.dumps([product.to_dict() for product in products]), ex=SERPAPI_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Redis cache write failed: {str(e)}")
+
+    async def _analyze_products_with_ai(self, products: List[CandidateProduct], original_query: str) -> List[CandidateProduct]:
         """Analyze products and calculate relevance scores using AI"""
         api_key = self.together_api_key or self.openrouter_api_key
         endpoint = self.together_endpoint if self.together_api_key else "https://openrouter.ai/api/v1/chat/completions"
@@ -302,353 +992,245 @@ class AIShoppingService:
             # Fallback scoring without AI
             logger.warning("No AI service API key available, using fallback scoring")
             for i, product in enumerate(products):
-                product.update({
-                    "relevance_score": max(0.1, 1.0 - (i * 0.1)),
-                    "explanation": f"Product matches your search for: {original_query}"
-                })
+                product.relevance_score = max(0.1, 1.0 - (i * 0.1))
+                product.explanation = f"Product matches your search for: {original_query}"
             return products
         
-        analyzed_products = []
+        if not products:
+            return products
         
         try:
-            async with aiohttp.ClientSession() as session:
-                headers = {
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json"
-                }
-                
-                for product in products:
-                    prompt = f"""
-                    Analyze this product for the query: "{original_query}"
-                    
-                    Product: {product['title']}
-                    Price: {product['price']}
-                    Description: {product['description']}
-                    
-                    Rate relevance (0-1) and explain why it matches or doesn't match.
-                    Return JSON: {{"relevance_score": 0.8, "explanation": "reason"}}
-                    """
-                    
-                    payload = {
-                        "model": "meta-llama/Llama-2-70b-chat-hf" if self.together_api_key else "anthropic/claude-3-haiku",
-                        "messages": [{"role": "user", "content": prompt}],
-                        "max_tokens": 150
-                    }
-                    
-                    try:
-                        async with session.post(endpoint, headers=headers, json=payload) as response:
-                            if response.status == 200:
-                                data = await response.json()
-                                content = data["choices"][0]["message"]["content"]
-                                try:
-                                    analysis = json.loads(content)
-                                    product.update(analysis)
-                                except json.JSONDecodeError:
-                                    product.update({
-                                        "relevance_score": 0.5,
-                                        "explanation": "Unable to analyze product relevance"
-                                    })
-                            else:
-                                product.update({
-                                    "relevance_score": 0.5,
-                                    "explanation": "Analysis unavailable"
-                                })
-                    except Exception as e:
-                        logger.warning(f"Error analyzing product {product['title']}: {str(e)}")
-                        product.update({
-                            "relevance_score": 0.5,
-                            "explanation": "Analysis unavailable"
-                        })
-                    
-                    analyzed_products.append(product)
+            session = await self._get_http_session()
+            headers = {
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json"
+            }
+            model = "meta-llama/Llama-2-70b-chat-hf" if self.together_api_key else "anthropic/claude-3-haiku"
+            
+            # Analyze every product in a single request; fall back to one request per product
+            # only if the batched response can't be used
+            if await self._analyze_products_batch(session, endpoint, headers, model, products, original_query):
+                return products
+            
+            logger.warning("Batched product analysis failed, analyzing products individually")
+            semaphore = asyncio.Semaphore(ANALYSIS_CONCURRENCY)
+            await asyncio.gather(*[
+                self._analyze_product(session, endpoint, headers, model, product, original_query, semaphore)
+                for product in products
+            ])
                 
-                return analyzed_products
+            return products
                 
         except Exception as e:
             logger.error(f"Error in AI product analysis: {str(e)}")
             # Return products with default scores
             for i, product in enumerate(products):
-                product.update({
-                    "relevance_score": max(0.1, 1.0 - (i * 0.1)),
-                    "explanation": f"Product matches your search criteria"
-                })
+                product.relevance_score = max(0.1, 1.0 - (i * 0.1))
+                product.explanation = "Product matches your search criteria"
             return products
 
-    def _rank_products(self, products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Rank products by relevance score and format for response"""
-        # Sort by relevance score
-        sorted_products = sorted(products, key=lambda x: x.get("relevance_score", 0), reverse=True)
-        
-        # Format products for API response
-        formatted_products = []
-        for i, product in enumerate(sorted_products):
-            formatted_product = {
-                "id": str(uuid.uuid4()),
-                "title": product.get("title", "Unknown Product"),
-                "description": product.get("description", ""),
-                "price": product.get("price", "Price not available"),
-                "currency": "₹",
-                "image_url": product.get("image_url", "/static/placeholder-product.svg"),
-                "rating": product.get("rating"),
-                "reviews_count": product.get("reviews_count"),
-                "availability": "In Stock",
-                "source": product.get("source", "Unknown"),
-                "url": product.get("url", "#"),
-                "relevance_score": product.get("relevance_score", 0.5),
-                "explanation": product.get("explanation", "Recommended based on your search criteria")
-            }
-            formatted_products.append(formatted_product)
+    async def _analyze_products_batch(
+        self,
+        session: aiohttp.ClientSession,
+        endpoint: str,
+        headers: Dict[str, str],
+        model: str,
+        products: List[CandidateProduct],
+        original_query: str
+    ) -> bool:
+        """Score all products with one LLM call. Returns False if the response couldn't be parsed."""
+        items = [
+            {"index": i, "title": product.title, "price": product.price, "description": product.description[:200]}
+            for i, product in enumerate(products)
+        ]
+        prompt = f"""
+        Analyze these products for the query: "{original_query}"
+        
+        Products: {orjson.dumps(items).decode()}
+        
+        For each product, rate relevance (0-1) and explain in one sentence why it matches or doesn't match.
+        Return a JSON array with one object per product index:
+        [{{"index": 0, "relevance_score": 0.8, "explanation": "reason"}}]
+        """
+        
+        payload = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            # Same budget per product as a single-product call, so the array isn't cut off mid-JSON
+            "max_tokens": 150 * len(products)
+        }
+        
+        try:
+            async with session.post(endpoint, headers=headers, json=payload) as response:
+                if response.status != 200:
+                    logger.warning(f"Batched product analysis error: {response.status}")
+                    return False
+                data = orjson.loads(await response.read())
+                analyses = orjson.loads(data["choices"][0]["message"]["content"])
+        except Exception as e:
+            logger.warning(f"Error in batched product analysis: {str(e)}")
+            return False
         
-        return formatted_products
+        if not isinstance(analyses, list):
+            return False
+        
+        analyzed = set()
+        for analysis in analyses:
+            index = analysis.get("index") if isinstance(analysis, dict) else None
+            if isinstance(index, int) and 0 <= index < len(products):
+                products[index].relevance_score = analysis.get("relevance_score", 0.5)
+                products[index].explanation = analysis.get("explanation")
+                analyzed.add(index)
+        
+        # Products the model skipped get a neutral score
+        for i, product in enumerate(products):
+            if i not in analyzed:
+                product.relevance_score = 0.5
+                product.explanation = "Analysis unavailable"
+        
+        return True
+
+    async def _analyze_product(
+        self,
+        session: aiohttp.ClientSession,
+        endpoint: str,
+        headers: Dict[str, str],
+        model: str,
+        product: CandidateProduct,
+        original_query: str,
+        semaphore: asyncio.Semaphore
+    ):
+        """Score a single product with its own LLM call"""
+        prompt = f"""
+        Analyze this product for the query: "{original_query}"
+        
+        Product: {product.title}
+        Price: {product.price}
+        Description: {product.description}
+        
+        Rate relevance (0-1) and explain why it matches or doesn't match.
+        Return JSON: {{"relevance_score": 0.8, "explanation": "reason"}}
+        """
+        
+        payload = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": 150
+        }
+        
+        try:
+            async with semaphore, session.post(endpoint, headers=headers, json=payload) as response:
+                if response.status == 200:
+                    data = orjson.loads(await response.read())
+                    content = data["choices"][0]["message"]["content"]
+                    try:
+                        analysis = orjson.loads(content)
+                        product.relevance_score = analysis.get("relevance_score", 0.5)
+                        product.explanation = analysis.get("explanation")
+                    except orjson.JSONDecodeError:
+                        product.relevance_score = 0.5
+                        product.explanation = "Unable to analyze product relevance"
+                else:
+                    product.relevance_score = 0.5
+                    product.explanation = "Analysis unavailable"
+        except Exception as e:
+            logger.warning(f"Error analyzing product {product.title}: {str(e)}")
+            product.relevance_score = 0.5
+            product.explanation = "Analysis unavailable"
+
+    def _rank_products(self, products: List[CandidateProduct], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Rank products by relevance score and format the top `limit` (or all) for response"""
+        if limit is None:
+            top_products = sorted(products, key=lambda x: x.relevance_score or 0, reverse=True)
+        else:
+            # Partial selection; same order as the first `limit` items of the full sort
+            top_products = heapq.nlargest(limit, products, key=lambda x: x.relevance_score or 0)
+        
+        return [self._format_product(product) for product in top_products]
+
+    def _format_product(self, product: CandidateProduct) -> Dict[str, Any]:
+        """Format a product for API response"""
+        return {
+            "id": f"{self._product_id_prefix}{next(self._product_id_counter):08x}",
+            "title": product.title,
+            "description": product.description,
+            "price": product.price,
+            "currency": "₹",
+            "image_url": product.image_url,
+            "rating": product.rating,
+            "reviews_count": product.reviews_count,
+            "availability": "In Stock",
+            "source": product.source,
+            "url": product.url,
+            "relevance_score": product.relevance_score if product.relevance_score is not None else 0.5,
+            "explanation": product.explanation or "Recommended based on your search criteria"
+        }
 
     async def _analyze_message_intent(self, message: str) -> Dict[str, Any]:
         """Analyze if a message requires product search or is conversational"""
         # Simple keyword-based intent detection
-        search_keywords = [
-            "buy", "purchase", "find", "looking for", "need", "want", "search",
-            "recommend", "suggest", "best", "cheap", "expensive", "under", "above",
-            "smartphone", "laptop", "watch", "headphones", "shoes", "clothes"
-        ]
-        
-        message_lower = message.lower()
-        requires_search = any(keyword in message_lower for keyword in search_keywords)
+        requires_search = SEARCH_INTENT_PATTERN.search(message.lower()) is not None
         
         return {
             "requires_search": requires_search,
             "intent": "product_search" if requires_search else "conversation"
         }
 
-    def _get_fallback_products(self, query: str) -> List[Dict[str, Any]]:
+    def _get_fallback_products(self, query: str) -> List[CandidateProduct]:
         """Generate fallback product data when SerpAPI is unavailable"""
-        query_lower = query.lower()
-        
-        # Smartphone fallbacks
-        if any(word in query_lower for word in ["smartphone", "phone", "mobile"]):
-            return [
-                {
-                    "title": "Samsung Galaxy A54 5G (Awesome Blue, 128GB)",
-                    "price": "₹38,999",
-                    "description": "6.4-inch Super AMOLED display, 50MP triple camera, 5000mAh battery",
-                    "image_url": "https://images.samsung.com/is/image/samsung/p6pim/in/2202/gallery/in-galaxy-a54-5g-a546-sm-a546elvcins-534851043",
-                    "rating": 4.3,
-                    "reviews_count": 15420,
-                    "source": "Amazon",
-                    "url": "https://amazon.in",
-                },
-                {
-                    "title": "Realme 11 Pro+ 5G (Oasis Green, 256GB)",
-                    "price": "₹31,999",
-                    "description": "6.7-inch curved AMOLED, 200MP camera, 100W SuperVOOC charging",
-                    "image_url": "https://image01.realme.net/general/20230510/1683709141064.jpg",
-                    "rating": 4.2,
-                    "reviews_count": 8934,
-                    "source": "Flipkart",
-                    "url": "https://flipkart.com",
-                }
-            ]
-        
-        # Laptop fallbacks
-        elif any(word in query_lower for word in ["laptop", "computer"]):
-            return [
-                {
-                    "title": "HP Pavilion 15 Intel Core i5 12th Gen Laptop",
-                    "price": "₹56,999",
-                    "description": "15.6-inch FHD, 8GB RAM, 512GB SSD, Windows 11",
-                    "image_url": "https://ssl-product-images.www8-hp.com/digmedialib/prodimg/lowres/c08140467.png",
-                    "rating": 4.1,
-                    "reviews_count": 2341,
-                    "source": "HP Store",
-                    "url": "https://hp.com",
-                }
-            ]
+        return [CandidateProduct(**product) for product in self._fallback_catalog(query)]
+
+    def _fallback_catalog(self, query: str) -> Tuple[Dict[str, Any], ...]:
+        """Sample catalog entries matching the query"""
+        category = self._product_category(query)
+        if category in FALLBACK_PRODUCTS_BY_CATEGORY:
+            return FALLBACK_PRODUCTS_BY_CATEGORY[category]
         
         # Default fallback for any query
-        else:
-            return [
-                {
-                    "title": f"Sample Product for {query}",
-                    "price": "₹15,999",
-                    "description": "High-quality product matching your search criteria",
-                    "image_url": "https://via.placeholder.com/300x200?text=Product",
-                    "rating": 4.0,
-                    "reviews_count": 500,
-                    "source": "Sample Store",
-                    "url": "#",
-                }
-            ]
+        return (
+            {
+                "title": f"Sample Product for {query}",
+                "price": "₹15,999",
+                "description": "High-quality product matching your search criteria",
+                "image_url": "https://via.placeholder.com/300x200?text=Product",
+                "rating": 4.0,
+                "reviews_count": 500,
+                "source": "Sample Store",
+                "url": "#",
+            },
+        )
+
+    def _product_category(self, text: str) -> Optional[str]:
+        """Category of the product keyword found in the text"""
+        return PRODUCT_CATEGORIES.get(self._extract_product_keyword(text))
 
-    async def _extract_product_keyword(self, message: str) -> Optional[str]:
+    def _extract_product_keyword(self, message: str) -> Optional[str]:
         """Extract product keyword from user message"""
-        # Common product categories
-        product_keywords = [
-            "smartphone", "phone", "mobile", "iphone", "android",
-            "laptop", "computer", "macbook", "chromebook",
-            "speakers", "speaker", "bluetooth speaker",
-            "earphones", "headphones", "earbuds", "airpods",
-            "tablet", "ipad",
-            "watch", "smartwatch", "fitness tracker",
-            "camera", "dslr", "mirrorless",
-            "tv", "television", "smart tv",
-            "mouse", "keyboard", "webcam",
-            "charger", "power bank", "cable",
-            "case", "cover", "screen protector"
-        ]
-        
         message_lower = message.lower()
-        for keyword in product_keywords:
-            if keyword in message_lower:
-                return keyword
-        
-        return None
+        return next((keyword for keyword in PRODUCT_KEYWORDS if keyword in message_lower), None)
 
-    async def _get_available_filters(self, keyword: str) -> List[Dict[str, Any]]:
+    def _get_available_filters(self, keyword: str) -> Tuple[Dict[str, Any], ...]:
         """Get available Google Shopping filters for a product category"""
-        
-        # Define filters based on product categories
-        if keyword in ["smartphone", "phone", "mobile", "iphone", "android"]:
-            return [
-                {
-                    "name": "Brand",
-                    "param": "brand",
-                    "options": ["Samsung", "Apple", "OnePlus", "Xiaomi", "Realme", "Oppo", "Vivo", "Google", "Nothing"]
-                },
-                {
-                    "name": "Price Range",
-                    "param": "price",
-                    "options": ["Under ₹10,000", "₹10,000 - ₹20,000", "₹20,000 - ₹40,000", "₹40,000 - ₹60,000", "Above ₹60,000"]
-                },
-                {
-                    "name": "Storage",
-                    "param": "storage",
-                    "options": ["64GB", "128GB", "256GB", "512GB", "1TB"]
-                },
-                {
-                    "name": "RAM",
-                    "param": "ram",
-                    "options": ["4GB", "6GB", "8GB", "12GB", "16GB"]
-                }
-            ]
-        
-        elif keyword in ["laptop", "computer", "macbook", "chromebook"]:
-            return [
-                {
-                    "name": "Brand",
-                    "param": "brand",
-                    "options": ["HP", "Dell", "Lenovo", "Asus", "Acer", "Apple", "MSI", "Samsung"]
-                },
-                {
-                    "name": "Price Range",
-                    "param": "price",
-                    "options": ["Under ₹30,000", "₹30,000 - ₹50,000", "₹50,000 - ₹80,000", "₹80,000 - ₹1,20,000", "Above ₹1,20,000"]
-                },
-                {
-                    "name": "Processor",
-                    "param": "processor",
-                    "options": ["Intel Core i3", "Intel Core i5", "Intel Core i7", "Intel Core i9", "AMD Ryzen 5", "AMD Ryzen 7", "Apple M1/M2"]
-                },
-                {
-                    "name": "RAM",
-                    "param": "ram",
-                    "options": ["4GB", "8GB", "16GB", "32GB"]
-                }
-            ]
-            
-        elif keyword in ["speakers", "speaker", "bluetooth speaker"]:
-            return [
-                {
-                    "name": "Brand",
-                    "param": "brand",
-                    "options": ["JBL", "Sony", "Bose", "Marshall", "Ultimate Ears", "Boat", "Portronics"]
-                },
-                {
-                    "name": "Price Range",
-                    "param": "price",
-                    "options": ["Under ₹2,000", "₹2,000 - ₹5,000", "₹5,000 - ₹10,000", "₹10,000 - ₹20,000", "Above ₹20,000"]
-                },
-                {
-                    "name": "Connectivity",
-                    "param": "connectivity",
-                    "options": ["Bluetooth", "Wi-Fi", "Wired", "Multi-room"]
-                }
-            ]
-            
-        elif keyword in ["earphones", "headphones", "earbuds", "airpods"]:
-            return [
-                {
-                    "name": "Brand",
-                    "param": "brand",
-                    "options": ["Apple", "Sony", "Bose", "JBL", "Sennheiser", "Boat", "OnePlus", "Samsung"]
-                },
-                {
-                    "name": "Price Range",
-                    "param": "price",
-                    "options": ["Under ₹1,500", "₹1,500 - ₹5,000", "₹5,000 - ₹10,000", "₹10,000 - ₹20,000", "Above ₹20,000"]
-                },
-                {
-                    "name": "Type",
-                    "param": "type",
-                    "options": ["True Wireless", "Wireless", "Wired", "Over-ear", "On-ear", "In-ear"]
-                },
-                {
-                    "name": "Features",
-                    "param": "features",
-                    "options": ["Active Noise Cancellation", "Wireless Charging", "Water Resistant", "Gaming", "Sports"]
-                }
-            ]
-        
-        # Default filters for other products
-        return [
-            {
-                "name": "Price Range",
-                "param": "price",
-                "options": ["Under ₹1,000", "₹1,000 - ₹5,000", "₹5,000 - ₹10,000", "₹10,000 - ₹25,000", "Above ₹25,000"]
-            },
-            {
-                "name": "Brand",
-                "param": "brand",
-                "options": ["Popular Brands", "Premium Brands", "Budget Brands"]
-            }
-        ]
+        return FILTERS_BY_CATEGORY.get(PRODUCT_CATEGORIES.get(keyword), DEFAULT_FILTERS)
 
-    async def _search_with_keyword(self, keyword: str) -> List[Dict[str, Any]]:
+    async def _search_with_keyword(self, keyword: str) -> List[CandidateProduct]:
         """Search Google Shopping with just the keyword"""
-        return await self._search_products_with_serpapi({"product_type": keyword})
+        return await self._search_products_with_serpapi({"product_type": keyword}) or []
 
-    async def _search_with_filters(self, keyword: str, filters: Dict[str, str]) -> List[Dict[str, Any]]:
-        """Search Google Shopping with keyword and applied filters"""
+    async def _search_with_filters(self, keyword: str, filters: Dict[str, str]) -> Tuple[List[CandidateProduct], bool]:
+        """
+        Search Google Shopping with keyword and applied filters.
+        Returns the products and whether they came from SerpAPI (False for filtered fallback samples).
+        """
         
         # Build search query with filters
-        search_query = keyword
-        
-        # Add filters to search query
-        if "brand" in filters and filters["brand"] not in ["Popular Brands", "Premium Brands", "Budget Brands"]:
-            search_query += f" {filters['brand']}"
-        
-        if "price" in filters:
-            price_filter = filters["price"]
-            if "Under" in price_filter:
-                price_value = price_filter.split("₹")[1].replace(",", "")
-                search_query += f" under {price_value}"
-            elif "-" in price_filter:
-                search_query += f" {price_filter.replace('₹', 'Rs ')}"
-        
-        if "storage" in filters:
-            search_query += f" {filters['storage']}"
-            
-        if "ram" in filters:
-            search_query += f" {filters['ram']} RAM"
-            
-        if "processor" in filters:
-            search_query += f" {filters['processor']}"
-            
-        if "type" in filters:
-            search_query += f" {filters['type']}"
-            
-        if "features" in filters:
-            search_query += f" {filters['features']}"
-            
-        if "connectivity" in filters:
-            search_query += f" {filters['connectivity']}"
+        terms = [keyword]
+        for param, build_term in FILTER_QUERY_BUILDERS.items():
+            if param in filters:
+                term = build_term(filters[param])
+                if term:
+                    terms.append(term)
+        search_query = " ".join(terms)
 
         logger.info(f"Searching with filtered query: {search_query}")
         
@@ -656,122 +1238,78 @@ class AIShoppingService:
         try:
             if not self.serpapi_key:
                 # Return filtered fallback products
-                return self._get_filtered_fallback_products(keyword, filters)
-                
-            async with aiohttp.ClientSession() as session:
-                params = {
-                    "engine": "google_shopping",
-                    "q": search_query,
-                    "api_key": self.serpapi_key,
-                    "num": 10,
-                    "gl": "in",
-                    "hl": "en"
-                }
+                return self._get_filtered_fallback_products(keyword, filters), False
                 
-                # Add price filter if available
-                if "price" in filters:
-                    price_filter = filters["price"]
-                    if "Under ₹" in price_filter:
-                        max_price = price_filter.split("₹")[1].replace(",", "")
-                        params["max_price"] = max_price
-                    elif "-" in price_filter and "₹" in price_filter:
-                        prices = price_filter.replace("₹", "").replace(",", "").split(" - ")
-                        if len(prices) == 2:
-                            params["min_price"] = prices[0].strip()
-                            params["max_price"] = prices[1].strip()
+            params = {**self._serpapi_base_params, "q": search_query}
                 
-                async with session.get(self.serpapi_endpoint, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        shopping_results = data.get("shopping_results", [])
-                        
-                        products = []
-                        for result in shopping_results:
-                            product = {
-                                "title": result.get("title", ""),
-                                "price": result.get("price", ""),
-                                "description": result.get("snippet", ""),
-                                "image_url": result.get("thumbnail", ""),
-                                "rating": result.get("rating"),
-                                "reviews_count": result.get("reviews"),
-                                "source": result.get("source", ""),
-                                "url": result.get("link", ""),
-                                "raw_data": result
-                            }
-                            products.append(product)
-                        
-                        return products
-                    elif response.status == 429:
-                        logger.warning("SerpAPI rate limit exceeded, using filtered fallback")
-                        return self._get_filtered_fallback_products(keyword, filters)
-                    else:
-                        logger.error(f"SerpAPI error {response.status}")
-                        return self._get_filtered_fallback_products(keyword, filters)
+            # Add price filter if available
+            if "price" in filters:
+                min_price, max_price = _parse_price_filter(filters["price"])
+                if min_price is not None:
+                    params["min_price"] = min_price
+                if max_price is not None:
+                    params["max_price"] = max_price
+            
+            products = await self._fetch_serpapi_products(params)
+            if products is None:
+                logger.warning("SerpAPI rate limit exceeded, using filtered fallback")
+                return self._get_filtered_fallback_products(keyword, filters), False
+            return products, True
                         
         except Exception as e:
             logger.error(f"Error in filtered search: {str(e)}")
-            return self._get_filtered_fallback_products(keyword, filters)
+            return self._get_filtered_fallback_products(keyword, filters), False
 
-    def _get_filtered_fallback_products(self, keyword: str, filters: Dict[str, str]) -> List[Dict[str, Any]]:
+    def _get_filtered_fallback_products(self, keyword: str, filters: Dict[str, str]) -> List[CandidateProduct]:
         """Generate filtered fallback products based on user selections"""
         base_products = self._get_fallback_products(keyword)
         
+        # Parse the brand and price choices once, not per product
+        brand = filters.get("brand")
+        brand_lower = brand.lower() if brand and brand not in GENERIC_BRAND_OPTIONS else None
+        min_price, max_price = _parse_price_filter(filters["price"]) if "price" in filters else (None, None)
+        
+        # Filter information for the explanation, the same for every product
+        explanation = "Matches your filters - " + ", ".join(f"{key.title()}: {value}" for key, value in filters.items())
+        
         # Apply basic filtering logic to fallback products
         filtered_products = []
         for product in base_products:
             # Check if product matches selected brand
-            if "brand" in filters:
-                brand = filters["brand"]
-                if brand not in ["Popular Brands", "Premium Brands", "Budget Brands"]:
-                    if brand.lower() not in product["title"].lower():
-                        continue
-            
-            # Check price range
-            if "price" in filters:
-                price_filter = filters["price"]
-                product_price = product.get("price", "₹0").replace("₹", "").replace(",", "")
-                try:
-                    price_num = int(product_price)
-                    if "Under ₹" in price_filter:
-                        max_price = int(price_filter.split("₹")[1].replace(",", ""))
-                        if price_num >= max_price:
-                            continue
-                    elif "-" in price_filter:
-                        prices = price_filter.replace("₹", "").replace(",", "").split(" - ")
-                        if len(prices) == 2:
-                            min_price, max_price = int(prices[0].strip()), int(prices[1].strip())
-                            if not (min_price <= price_num <= max_price):
-                                continue
-                except:
-                    pass
+            if brand_lower and brand_lower not in product.title.lower():
+                continue
             
-            # Add filter information to explanation
-            filter_info = []
-            for key, value in filters.items():
-                filter_info.append(f"{key.title()}: {value}")
+            # Check price range (products without a plain price are kept)
+            if min_price is not None or max_price is not None:
+                price_num = _price_value(product.price)
+                if price_num is not None and (
+                    (min_price is not None and price_num < min_price) or (max_price is not None and price_num > max_price)
+                ):
+                    continue
             
-            product["explanation"] = f"Matches your filters - {', '.join(filter_info)}"
+            product.explanation = explanation
             filtered_products.append(product)
         
         return filtered_products if filtered_products else base_products
 
     async def _generate_conversational_response(self, message: str) -> str:
         """Generate a conversational response for non-search queries"""
-        # Simple conversational responses
-        greetings = ["hello", "hi", "hey", "good morning", "good afternoon", "good evening"]
-        thanks = ["thank you", "thanks", "appreciate"]
-        help_requests = ["help", "how", "what can you do"]
-        
+        return self._match_conversational_reply(message) or DEFAULT_CONVERSATION_REPLY
+
+    def _match_conversational_reply(self, message: str) -> Optional[str]:
+        """Reply for a greeting, thanks or help request, or None if the message is none of these"""
         message_lower = message.lower()
         
-        if any(greeting in message_lower for greeting in greetings):
-            return "Hello! I'm your AI Shopping Agent. I can help you find products based on your needs. Just tell me what you're looking for!"
+        # Bare greetings and acknowledgements are answered without scanning for keywords
+        canned = CANNED_REPLIES.get(message_lower.strip(" !.?"))
+        if canned:
+            return canned
         
-        elif any(thank in message_lower for thank in thanks):
-            return "You're welcome! Is there anything else I can help you find today?"
+        # Whole words only, so "this" or "show" don't read as "hi" or "how".
+        # The highest-priority category found picks the reply.
+        words = set(QUERY_TOKEN_PATTERN.findall(message_lower))
+        categories = {CONVERSATION_WORD_CATEGORIES[word] for word in CONVERSATION_WORD_CATEGORIES.keys() & words}
+        categories.update(CONVERSATION_CATEGORY_BY_KEYWORD[match.group(0)] for match in CONVERSATION_PHRASE_PATTERN.finditer(message_lower))
+        category = min(categories, key=CONVERSATION_PRIORITY.__getitem__, default=None)
         
-        elif any(help_word in message_lower for help_word in help_requests):
-            return "I can help you find products by understanding your natural language queries. For example, you can say 'I need a smartphone under ₹20000 with good camera' and I'll find the best options for you!"
-        
-        else:
-            return "I'm here to help you find products! Could you tell me what you're looking for? I can search for electronics, clothing, accessories, and much more."
+        return CONVERSATION_REPLIES.get(category)